@@ -0,0 +1,89 @@
+import time
+import asyncio
+import argparse
+from aiohttp import web, WSMsgType
+
+import tts
+
+# Serveur de substitution : même protocole WebSocket qu'Edge TTS, en local.
+# SETUP_DELAY simule la poignée de main TLS et la mise en place d'une connexion
+# au vrai service, REQUEST_DELAY le temps de synthèse d'une réplique courte.
+SETUP_DELAY = 0.15
+REQUEST_DELAY = 0.02
+SAMPLE_CLIP = "docs/audio/guerre_002.mp3"  # Un « Oui. » de la scène guerre
+
+def stand_in_app(audio, setup_delay, request_delay, drop_every=0):
+    async def handle(request):
+        await asyncio.sleep(setup_delay)
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        served = 0
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            headers = tts.parse_headers(msg.data.encode("utf-8").split(b"\r\n\r\n", 1)[0])
+            if headers.get(b"Path") != b"ssml":
+                continue
+            request_id = headers[b"X-RequestId"].decode()
+            if drop_every and served == drop_every:
+                # Coupure en plein tour, comme un service qui ferme les connexions inactives
+                await ws.close()
+                break
+            served += 1
+            await asyncio.sleep(request_delay)
+            await ws.send_str(f"X-RequestId:{request_id}\r\nPath:turn.start\r\n\r\n{{}}")
+            header = f"X-RequestId:{request_id}\r\nContent-Type:audio/mpeg\r\nPath:audio\r\n".encode()
+            await ws.send_bytes(len(header).to_bytes(2, "big") + header + audio)
+            await ws.send_str(f"X-RequestId:{request_id}\r\nPath:turn.end\r\n\r\n{{}}")
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/", handle)
+    return app
+
+async def run(url, requests, concurrency, reuse):
+    """Synthétise requests répliques ; reuse=False rouvre une connexion par réplique (comme edge_tts.Communicate)."""
+    texts = [f"Oui. ({n})" for n in range(requests)]
+    start = time.perf_counter()
+    if reuse:
+        async with tts.TTSPool(concurrency, url=url) as pool:
+            await asyncio.gather(*(pool.synthesize(text, "fr-FR-HenriNeural") for text in texts))
+            connections = pool.connections
+    else:
+        slots = asyncio.Semaphore(concurrency)
+
+        async def one_shot(text):
+            async with slots:
+                async with tts.TTSPool(1, url=url) as pool:
+                    await pool.synthesize(text, "fr-FR-HenriNeural")
+
+        await asyncio.gather(*(one_shot(text) for text in texts))
+        connections = requests
+    return requests / (time.perf_counter() - start), connections
+
+async def main(args):
+    with open(SAMPLE_CLIP, "rb") as f:
+        audio = f.read()
+    runner = web.AppRunner(stand_in_app(audio, args.setup_delay, args.request_delay, args.drop_every))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    url = f"ws://127.0.0.1:{runner.addresses[0][1]}/"
+
+    print(f"--- {args.requests} répliques, {args.concurrency} en parallèle, "
+          f"connexion {args.setup_delay * 1000:.0f} ms, synthèse {args.request_delay * 1000:.0f} ms ---")
+    try:
+        for label, reuse in (("Une connexion par réplique", False), ("Connexions réutilisées", True)):
+            rate, connections = await run(url, args.requests, args.concurrency, reuse)
+            print(f"{label:28s}: {rate:7.1f} répliques/s, {connections} connexion(s)")
+    finally:
+        await runner.cleanup()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mesure le débit du client TTS sur un serveur de substitution.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=tts.POOL_SIZE)
+    parser.add_argument("--setup-delay", type=float, default=SETUP_DELAY)
+    parser.add_argument("--request-delay", type=float, default=REQUEST_DELAY)
+    parser.add_argument("--drop-every", type=int, default=0,
+                        help="Le serveur coupe chaque connexion après N répliques (test de reconnexion)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,139 @@
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+import aiohttp
+from aiohttp import web
+
+import serveur
+
+# Seuils au-delà desquels on considère qu'un appareil aurait « décroché »
+MAX_FETCH_P95 = 0.200   # secondes pour récupérer un extrait audio
+MAX_CUE_SKEW = 0.100    # écart maximal de réception d'une réplique entre appareils
+
+# --- APPAREILS SIMULÉS ---
+
+class SimulatedDevice:
+    """Un téléphone de comédien : charge la page, rejoint la session, joue ou attend chaque réplique."""
+
+    def __init__(self, base_url, scene_name, role, speak_delay, stats):
+        self.base_url = base_url
+        self.scene_name = scene_name
+        self.role = role
+        self.speak_delay = speak_delay
+        self.stats = stats
+        self.dialogue = None
+
+    async def fetch(self, http, path, headers=None):
+        start = time.perf_counter()
+        async with http.get(self.base_url + path, headers=headers or {}) as resp:
+            body = await resp.read()
+            if resp.status not in (200, 206, 304):
+                raise RuntimeError(f"{path} : HTTP {resp.status}")
+        self.stats["fetch"].append(time.perf_counter() - start)
+        return resp, body
+
+    async def fetch_clip(self, http, path):
+        # Comme un navigateur : un premier morceau puis le reste par Range
+        resp, _ = await self.fetch(http, "/" + path, {"Range": "bytes=0-16383"})
+        size = int(resp.headers["Content-Range"].rsplit("/", 1)[1])
+        if size > 16384:
+            await self.fetch(http, "/" + path, {"Range": "bytes=16384-"})
+
+    async def run(self, http, ready, go):
+        await self.fetch(http, "/index.html", {"Accept-Encoding": "gzip"})
+        resp, _ = await self.fetch(http, "/" + serveur.SCENES_DATA_FILE, {"Accept-Encoding": "gzip"})
+        # Deuxième chargement : l'ETag doit éviter de renvoyer les données
+        await self.fetch(http, "/" + serveur.SCENES_DATA_FILE, {"If-None-Match": resp.headers["ETag"]})
+        self.dialogue = (await resp.json(content_type=None))[self.scene_name]["dialogue"]
+
+        async with http.ws_connect(self.base_url + "/ws") as ws:
+            await ws.send_json({"type": "join", "scene": self.scene_name, "role": self.role})
+            ready.set()
+            await go.wait()
+            async for msg in ws:
+                data = msg.json()
+                if data["type"] == "error":
+                    raise RuntimeError(data["message"])
+                if data["type"] == "end":
+                    break
+                if data["type"] != "cue":
+                    continue
+                self.stats["cues"].setdefault(data["line"], []).append(time.perf_counter())
+                line = self.dialogue[data["line"]]
+                if line.get("audio"):
+                    # Tous les appareils préchargent l'extrait, seul l'hôte le « joue »
+                    await self.fetch_clip(http, line["audio"])
+                if data["turn"] in ("me", "play"):
+                    await asyncio.sleep(self.speak_delay)
+                    await ws.send_json({"type": "done", "line": data["line"]})
+
+# --- SCÉNARIO ---
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+async def run_load_test(base_url, scene_name, clients, speak_delay):
+    stats = {"fetch": [], "cues": {}}
+    async with aiohttp.ClientSession() as http:
+        async with http.get(base_url + "/" + serveur.SCENES_DATA_FILE) as resp:
+            scene = (await resp.json(content_type=None))[scene_name]
+
+        # Chaque rôle est tenu par un appareil, les autres écoutent en spectateurs
+        roles = scene["roles"][:clients - 1]
+        assigned = [None] + roles + [None] * (clients - 1 - len(roles))
+        devices = [SimulatedDevice(base_url, scene_name, role, speak_delay, stats) for role in assigned]
+
+        go = asyncio.Event()
+        readies = [asyncio.Event() for _ in devices]
+        tasks = [asyncio.create_task(d.run(http, r, go)) for d, r in zip(devices, readies)]
+        await asyncio.gather(*(r.wait() for r in readies))
+        await asyncio.sleep(0.2)  # laisse arriver tous les "join"
+
+        start = time.perf_counter()
+        go.set()
+        async with http.ws_connect(base_url + "/ws") as starter:
+            await starter.send_json({"type": "join", "scene": scene_name, "role": None})
+            await starter.send_json({"type": "start"})
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    skews = [max(t) - min(t) for t in stats["cues"].values() if len(t) == clients]
+    print(f"--- Test de charge : {clients} appareils, scène '{scene_name}' ({len(scene['dialogue'])} répliques) ---")
+    print(f"Durée totale       : {elapsed:.2f} s")
+    print(f"Requêtes HTTP      : {len(stats['fetch'])}")
+    print(f"Latence HTTP       : p50 {statistics.median(stats['fetch']) * 1000:.1f} ms, "
+          f"p95 {percentile(stats['fetch'], 0.95) * 1000:.1f} ms, max {max(stats['fetch']) * 1000:.1f} ms")
+    print(f"Écart entre appareils sur une réplique : p95 {percentile(skews, 0.95) * 1000:.1f} ms, "
+          f"max {max(skews) * 1000:.1f} ms")
+
+    ok = percentile(stats["fetch"], 0.95) <= MAX_FETCH_P95 and percentile(skews, 0.95) <= MAX_CUE_SKEW
+    print("Résultat : OK" if ok else "Résultat : TROP LENT")
+    return ok
+
+async def main(args):
+    if args.url:
+        return await run_load_test(args.url.rstrip("/"), args.scene, args.clients, args.delay)
+
+    # Sans URL, on démarre le serveur sur un port libre dans ce processus
+    runner = web.AppRunner(serveur.create_app(args.export_dir))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        return await run_load_test(f"http://127.0.0.1:{port}", args.scene, args.clients, args.delay)
+    finally:
+        await runner.cleanup()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simule plusieurs appareils sur une répétition partagée.")
+    parser.add_argument("--url", help="Serveur déjà lancé (sinon un serveur local est démarré)")
+    parser.add_argument("--export-dir", default=serveur.EXPORT_DIR)
+    parser.add_argument("--scene", default="mariage")
+    parser.add_argument("--clients", type=int, default=12)
+    parser.add_argument("--delay", type=float, default=0.02, help="Durée simulée d'une réplique (s)")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args)) else 1)
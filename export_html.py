@@ -1,15 +1,26 @@
 import os
 import re
 import json
+import time
 import asyncio
-import edge_tts
 import shutil
+import tts
+from index_scene import build_cue_index, build_labels, build_search_index, clean_text, is_spoken, last_sentence
 
 # --- CONFIGURATION ---
 SCENES_DIR = "scenes"
 CASTING_FILE = "casting.json"
 EXPORT_DIR = "docs"  # Changement ici : 'export' -> 'docs' pour GitHub Pages
 AUDIO_DIR = "audio"
+SCENES_DATA_FILE = "scenes.json"
+SEARCH_INDEX_FILE = "search.json"  # Chargé par la page à la première recherche
+TTS_CONCURRENCY = 4  # Connexions Edge TTS gardées ouvertes pendant l'export
+
+# Estimations du plan d'export (--plan)
+PLAN_CONNECT_SECONDS = 1.0    # ouverture d'une connexion (TLS + configuration)
+PLAN_REQUEST_SECONDS = 0.3    # aller-retour d'une requête sur une connexion ouverte
+PLAN_CHARS_PER_SECOND = 150   # débit de synthèse du service
+PLAN_BYTES_PER_CHAR = 420     # MP3 48 kbit/s, environ 14 caractères par seconde de parole
 
 # --- FONCTIONS UTILITAIRES ---
 
@@ -52,6 +63,78 @@ def load_scene(filepath):
 
 # --- GÉNÉRATION ---
 
+async def save_audio(text, voice, filepath, speaker, pool):
+    """Copie l'extrait (synthétisé ou pris dans le cache), retourne False (avec un message) en cas d'échec."""
+    try:
+        shutil.copyfile(await tts.get_clip(text, voice, pool), filepath)
+        return True
+    except Exception as e:
+        print(f"  Erreur audio ({speaker}): {e}")
+        return False
+
+async def export_scene(scene_name, dialogue, config, full_audio_path, pool):
+    """Synthétise les extraits d'une scène (en parallèle sur les connexions du pool)."""
+    roles = sorted(list(set(d.get('speaker', 'UNKNOWN') for d in dialogue)))
+    safe_scene_name = re.sub(r'[^a-zA-Z0-9]', '_', scene_name)
+    done = 0
+
+    async def export_line(index, line):
+        nonlocal done
+        speaker = line.get('speaker', 'UNKNOWN')
+        text = line.get('text', '')
+        action = line.get('action', '')
+        voice = get_voice_for_speaker(speaker, config)
+        
+        filename = f"{safe_scene_name}_{index:03d}.mp3"
+        filepath = os.path.join(full_audio_path, filename)
+        
+        text_clean = clean_text(text)
+        
+        has_audio = False
+        if text_clean.strip():
+            has_audio = await save_audio(text_clean, voice, filepath, speaker, pool)
+        
+        done += 1
+        if done % 10 == 0:
+            print(f"  -> {done}/{len(dialogue)}...")
+        return {
+            "id": index,
+            "speaker": speaker,
+            "text": text,
+            "action": action,
+            "voice": voice,
+            "audio": f"{AUDIO_DIR}/{filename}" if has_audio else None
+        }
+
+    processed_dialogue = await asyncio.gather(*(export_line(index, line) for index, line in enumerate(dialogue)))
+    
+    # Mode « répliques seules » : la dernière phrase de chaque signal a son propre extrait
+    cues = build_cue_index(dialogue)
+    cue_lines = sorted({pair["cue"] for pairs in cues.values() for pair in pairs if pair["cue"] is not None})
+
+    async def export_cue(index):
+        line = processed_dialogue[index]
+        tail = last_sentence(line["text"])
+        if tail == clean_text(line["text"]):
+            return True  # Une seule phrase : l'extrait complet suffit
+        filename = f"{safe_scene_name}_{index:03d}_fin.mp3"
+        voice = get_voice_for_speaker(line["speaker"], config)
+        if not await save_audio(tail, voice, os.path.join(full_audio_path, filename), line["speaker"], pool):
+            return False
+        line["cue_audio"] = f"{AUDIO_DIR}/{filename}"
+        return True
+
+    tails_done = await asyncio.gather(*(export_cue(index) for index in cue_lines))
+
+    return {
+        "roles": roles,
+        "dialogue": processed_dialogue,
+        "cues": cues,
+        # La page ne propose le mode « répliques seules » que si toutes les fins de signal existent
+        "cue_tails": all(tails_done),
+        "labels": build_labels(dialogue)
+    }
+
 async def generate_export():
     print(f"--- Démarrage de l'export HTML pour GitHub Pages (dossier docs/) ---")
     
@@ -59,6 +142,12 @@ async def generate_export():
     full_audio_path = os.path.join(full_export_path, AUDIO_DIR)
     
     if os.path.exists(full_export_path):
+        # Les extraits encore valables passent dans le cache avant d'effacer l'export
+        previous = previous_clips(full_export_path)
+        for (text, voice), path in previous.items():
+            tts.store_clip(text, voice, path)
+        if previous:
+            print(f"Extraits de l'export précédent conservés : {len(previous)}")
         shutil.rmtree(full_export_path)
     os.makedirs(full_audio_path)
     
@@ -80,55 +169,149 @@ async def generate_export():
 
     print(f"Scènes trouvées : {len(scene_files)}")
 
-    for scene_file in scene_files:
-        scene_name = os.path.splitext(scene_file)[0]
-        print(f"\nTraitement de la scène : {scene_name}")
-        
-        dialogue = load_scene(os.path.join(SCENES_DIR, scene_file))
-        if not dialogue: continue
-
-        roles = sorted(list(set(d.get('speaker', 'UNKNOWN') for d in dialogue)))
-        processed_dialogue = []
-        
-        for index, line in enumerate(dialogue):
-            speaker = line.get('speaker', 'UNKNOWN')
-            text = line.get('text', '')
-            action = line.get('action', '')
-            voice = get_voice_for_speaker(speaker, config)
-            
-            safe_scene_name = re.sub(r'[^a-zA-Z0-9]', '_', scene_name)
-            filename = f"{safe_scene_name}_{index:03d}.mp3"
-            filepath = os.path.join(full_audio_path, filename)
-            
-            text_clean = re.sub(r'\([^\)]+\)', '', text)
+    async with tts.TTSPool(TTS_CONCURRENCY) as pool:
+        for scene_file in scene_files:
+            scene_name = os.path.splitext(scene_file)[0]
+            print(f"\nTraitement de la scène : {scene_name}")
             
-            has_audio = False
-            if text_clean.strip():
-                try:
-                    communicate = edge_tts.Communicate(text_clean, voice)
-                    await communicate.save(filepath)
-                    has_audio = True
-                except Exception as e:
-                    print(f"  Erreur audio ({speaker}): {e}")
-            
-            processed_dialogue.append({
-                "id": index,
-                "speaker": speaker,
-                "text": text,
-                "action": action,
-                "audio": f"{AUDIO_DIR}/{filename}" if has_audio else None
-            })
-            
-            if index % 10 == 0:
-                print(f"  -> {index}/{len(dialogue)}...")
+            dialogue = load_scene(os.path.join(SCENES_DIR, scene_file))
+            if not dialogue: continue
+
+            scenes_data[scene_name] = await export_scene(scene_name, dialogue, config, full_audio_path, pool)
+
+    write_export_files(full_export_path, scenes_data)
         
-        scenes_data[scene_name] = {
-            "roles": roles,
-            "dialogue": processed_dialogue
-        }
+    print(f"--- Export terminé avec succès ! ---")
+    print(f"Ouvrez ce fichier : {os.path.join(full_export_path, 'index.html')}")
 
-    # --- GÉNÉRATION HTML ---
-    
+# --- PLAN D'EXPORT ---
+
+def scene_clips(dialogue, config):
+    """Extraits (texte, voix) d'une scène : un par réplique parlée, plus les fins de signal."""
+    clips = []
+    for line in dialogue:
+        if is_spoken(line):
+            clips.append((clean_text(line['text']), get_voice_for_speaker(line.get('speaker', 'UNKNOWN'), config)))
+    cues = build_cue_index(dialogue)
+    for index in sorted({pair["cue"] for pairs in cues.values() for pair in pairs if pair["cue"] is not None}):
+        line = dialogue[index]
+        tail = last_sentence(line['text'])
+        if tail != clean_text(line['text']):
+            clips.append((tail, get_voice_for_speaker(line.get('speaker', 'UNKNOWN'), config)))
+    return clips
+
+def previous_clips(full_export_path):
+    """Extraits de l'export précédent : {(texte, voix): chemin}.
+
+    Les exports antérieurs à l'enregistrement de la voix de chaque réplique
+    sont ignorés : rien ne garantit que le casting n'a pas changé depuis.
+    """
+    scenes_path = os.path.join(full_export_path, SCENES_DATA_FILE)
+    if not os.path.exists(scenes_path):
+        return {}
+    with open(scenes_path, "r", encoding="utf-8") as f:
+        scenes_data = json.load(f)
+    clips = {}
+    for scene in scenes_data.values():
+        for line in scene["dialogue"]:
+            voice = line.get("voice")
+            if not voice:
+                continue
+            for text, audio in ((clean_text(line["text"]), line.get("audio")),
+                                (last_sentence(line["text"]), line.get("cue_audio"))):
+                if audio and os.path.exists(os.path.join(full_export_path, audio)):
+                    clips[(text, voice)] = os.path.join(full_export_path, audio)
+    return clips
+
+def format_duration(seconds):
+    seconds = round(seconds)
+    if seconds < 60:
+        return f"{seconds} s"
+    return f"{seconds // 60} min {seconds % 60:02d} s"
+
+def format_size(size):
+    if size < 1024 * 1024:
+        return f"{size / 1024:.0f} Ko"
+    return f"{size / (1024 * 1024):.1f} Mo"
+
+def plan_export():
+    """Ce que coûterait l'export : requêtes, caractères, durée et taille, sans rien synthétiser.
+
+    Chaque couple (texte, voix) n'est synthétisé qu'une fois ; ceux du cache
+    ou de l'export précédent sont seulement copiés.
+    """
+    started = time.perf_counter()
+    config = load_casting(CASTING_FILE)
+    previous = previous_clips(os.path.join(os.getcwd(), EXPORT_DIR))
+    scene_files = sorted(f for f in os.listdir(SCENES_DIR) if f.endswith(".json"))
+    if not scene_files:
+        print(f"Erreur : Aucun fichier .json trouvé dans '{SCENES_DIR}'")
+        return
+
+    sizes = {}   # (texte, voix) -> taille connue ou estimée de l'extrait
+    scenes = {}
+    voices = {}
+    reused = 0
+    for scene_file in scene_files:
+        row = scenes[os.path.splitext(scene_file)[0]] = {"clips": 0, "requests": 0, "chars": 0, "size": 0}
+        for key in scene_clips(load_scene(os.path.join(SCENES_DIR, scene_file)), config):
+            text, voice = key
+            voice_row = voices.setdefault(voice, {"clips": 0, "requests": 0, "chars": 0, "size": 0})
+            if key not in sizes:
+                if tts.is_cached(text, voice):
+                    sizes[key] = os.path.getsize(tts.cache_path(text, voice))
+                    reused += 1
+                elif key in previous:
+                    sizes[key] = os.path.getsize(previous[key])
+                    reused += 1
+                else:
+                    # Première occurrence d'un extrait à synthétiser : la scène en porte le coût
+                    sizes[key] = len(text) * PLAN_BYTES_PER_CHAR
+                    for counts in (row, voice_row):
+                        counts["requests"] += 1
+                        counts["chars"] += len(text)
+            for counts in (row, voice_row):
+                counts["clips"] += 1
+                counts["size"] += sizes[key]
+
+    def synthesis_time(counts):
+        """Durée de synthèse, les requêtes étant réparties sur TTS_CONCURRENCY connexions."""
+        return (counts["requests"] * PLAN_REQUEST_SECONDS + counts["chars"] / PLAN_CHARS_PER_SECOND) / TTS_CONCURRENCY
+
+    total = {key: sum(row[key] for row in scenes.values()) for key in ("clips", "requests", "chars", "size")}
+    wall_time = synthesis_time(total) + (PLAN_CONNECT_SECONDS if total["requests"] else 0)
+
+    def print_table(title, rows):
+        print(f"{title:<24} {'Extraits':>8} {'Requêtes':>8} {'Caractères':>10} {'Durée':>12} {'Taille':>9}")
+        for name, row in rows:
+            print(f"{name[:24]:<24} {row['clips']:>8} {row['requests']:>8} {row['chars']:>10} "
+                  f"{format_duration(synthesis_time(row)):>12} {format_size(row['size']):>9}")
+
+    print(f"--- Plan d'export : {len(scenes)} scène(s), {TTS_CONCURRENCY} connexion(s) en parallèle ---")
+    print_table("Scène", scenes.items())
+    print()
+    print_table("Voix", sorted(voices.items()))
+
+    print(f"\nTotal : {total['requests']} requête(s) pour {total['clips']} extrait(s) "
+          f"({reused} déjà en cache ou exporté(s), {total['clips'] - len(sizes)} doublon(s))")
+    print(f"Durée estimée : {format_duration(wall_time)}, taille audio : {format_size(total['size'])}")
+    print(f"Aucune synthèse effectuée (plan calculé en {(time.perf_counter() - started) * 1000:.0f} ms).")
+
+# --- GÉNÉRATION HTML ---
+
+def write_export_files(full_export_path, scenes_data):
+    """Écrit index.html, scenes.json (données servies par serveur.py) et l'index de recherche."""
+    with open(os.path.join(full_export_path, SCENES_DATA_FILE), "w", encoding="utf-8") as f:
+        json.dump(scenes_data, f, ensure_ascii=False)
+
+    search_index = build_search_index({name: scene["dialogue"] for name, scene in scenes_data.items()})
+    with open(os.path.join(full_export_path, SEARCH_INDEX_FILE), "w", encoding="utf-8") as f:
+        json.dump(search_index, f, ensure_ascii=False, separators=(',', ':'))
+
+    with open(os.path.join(full_export_path, "index.html"), "w", encoding="utf-8") as f:
+        f.write(build_html(scenes_data))
+
+def build_html(scenes_data):
     html_content = f"""
 <!DOCTYPE html>
 <html lang="fr">
@@ -205,6 +388,48 @@ async def generate_export():
             font-size: 1.1em;
         }}
 
+        input[type="range"] {{
+            width: 100%;
+            margin: 15px 0;
+            accent-color: var(--accent-color);
+        }}
+
+        input[type="search"] {{
+            width: 100%;
+            box-sizing: border-box;
+            padding: 12px;
+            margin: 15px 0 5px;
+            background: #333;
+            color: white;
+            border: 1px solid #555;
+            border-radius: 4px;
+            font-family: var(--font-script);
+            font-size: 1em;
+        }}
+
+        #search-results {{
+            max-height: 200px;
+            overflow-y: auto;
+            text-align: left;
+            margin-bottom: 10px;
+        }}
+
+        .search-result {{
+            padding: 8px;
+            border-bottom: 1px solid #333;
+            cursor: pointer;
+            font-size: 0.85em;
+            color: #bbb;
+        }}
+
+        .search-result:hover {{
+            background: rgba(212, 175, 55, 0.1);
+        }}
+
+        .search-result b {{
+            color: var(--accent-color);
+        }}
+
         button.start-btn {{
             background: var(--accent-color);
             color: #000;
@@ -377,6 +602,12 @@ async def generate_export():
     <div id="setup">
         <h1>THÉÂTRE STUDIO</h1>
         <div class="setup-card">
+            <div class="form-group">
+                <label>RECHERCHER</label>
+                <input type="search" id="search-input" placeholder="Une réplique, un personnage..." oninput="runSearch()">
+                <div id="search-results"></div>
+            </div>
+
             <div class="form-group">
                 <label>SCÈNE</label>
                 <select id="scene-select" onchange="updateRoles()">
@@ -391,6 +622,22 @@ async def generate_export():
                 </select>
             </div>
 
+            <div class="form-group" id="start-group" style="display:none;">
+                <label>À PARTIR DE</label>
+                <select id="start-select">
+                    <!-- Rempli par JS -->
+                </select>
+            </div>
+
+            <div class="form-group" id="drill-group" style="display:none;">
+                <label><input type="checkbox" id="drill-check"> RÉPLIQUES SEULES</label>
+            </div>
+
+            <div class="form-group" id="tempo-group" style="display:none;">
+                <label>TEMPO DES PARTENAIRES : <span id="tempo-value">1x</span></label>
+                <input type="range" id="tempo-range" min="1" max="2" step="0.25" value="1" oninput="updateTempo()">
+            </div>
+
             <button class="start-btn" id="start-btn" onclick="startRehearsal()" style="display:none;">ENTRER EN SCÈNE</button>
         </div>
     </div>
@@ -420,10 +667,35 @@ async def generate_export():
         let userStep = "verify"; 
         let audioPlayer = new Audio();
 
+        // Mode ensemble : page servie par serveur.py, la réplique courante est tenue par le serveur
+        const ensembleMode = new URLSearchParams(location.search).has('ensemble');
+        let ensembleSocket = null;
+
+        // Mode répliques seules : pour chaque réplique jouée, la suivante (null = toute la scène)
+        let drillNext = null;
+
+        // Reprise en cours de scène et préchargement des extraits suivants
+        const PREFETCH_AHEAD = 3;
+        let startLine = 0;
+        let prefetched = new Map();
+
+        // Tempo des répliques des partenaires : les extraits sont accélérés à la lecture, sans changer de hauteur
+        let tempo = 1;
+
+        // Recherche : index construit à l'export, chargé à la première frappe
+        const MAX_SEARCH_RESULTS = 20;
+        let searchIndex = null;
+        let searchLoading = null;
+        let lastResults = [];
+
         const sceneSelect = document.getElementById('scene-select');
         const roleSelect = document.getElementById('role-select');
         const roleGroup = document.getElementById('role-group');
         const startBtn = document.getElementById('start-btn');
+        const drillGroup = document.getElementById('drill-group');
+        const startSelect = document.getElementById('start-select');
+        const startGroup = document.getElementById('start-group');
+        const tempoGroup = document.getElementById('tempo-group');
 
         Object.keys(allScenesData).forEach(sceneName => {{
             const option = document.createElement('option');
@@ -435,6 +707,7 @@ async def generate_export():
         function updateRoles() {{
             const sceneName = sceneSelect.value;
             roleSelect.innerHTML = "";
+            startSelect.innerHTML = "";
             
             if (sceneName && allScenesData[sceneName]) {{
                 const roles = allScenesData[sceneName].roles;
@@ -444,22 +717,152 @@ async def generate_export():
                     option.textContent = role;
                     roleSelect.appendChild(option);
                 }});
+                allScenesData[sceneName].labels.forEach(entry => {{
+                    const option = document.createElement('option');
+                    option.value = entry.line;
+                    option.textContent = entry.label;
+                    startSelect.appendChild(option);
+                }});
                 roleGroup.style.display = 'block';
+                startGroup.style.display = 'block';
+                drillGroup.style.display = ensembleMode || !allScenesData[sceneName].cue_tails ? 'none' : 'block';
+                tempoGroup.style.display = 'block';
                 startBtn.style.display = 'inline-block';
             }} else {{
                 roleGroup.style.display = 'none';
+                startGroup.style.display = 'none';
+                drillGroup.style.display = 'none';
+                tempoGroup.style.display = 'none';
                 startBtn.style.display = 'none';
             }}
         }}
 
+        function foldText(text) {{
+            // Même pliage que index_scene.fold côté Python
+            return text.replace(/’/g, "'").replace(/œ/g, 'oe').replace(/Œ/g, 'OE').replace(/æ/g, 'ae').replace(/Æ/g, 'AE')
+                .normalize('NFD').replace(/[\\u0300-\\u036f]/g, '').toLowerCase();
+        }}
+
+        function tokenize(text) {{
+            return (foldText(text).match(/[a-z0-9]+/g) || []).filter(token => token.length > 1 && token !== "qu");
+        }}
+
+        function decodeGaps(gaps) {{
+            let current = 0;
+            return gaps.map(gap => current += gap);
+        }}
+
+        function buildSearchIndex() {{
+            // Page ouverte sans serveur (file://) : on reconstruit l'index à partir des scènes
+            const postings = {{}};
+            const index = {{ scenes: Object.keys(allScenesData), docs: [], terms: [], postings: [] }};
+            index.scenes.forEach((sceneName, sceneId) => {{
+                allScenesData[sceneName].dialogue.forEach((line, position) => {{
+                    const text = line.text.replace(/\\([^\\)]+\\)/g, '');
+                    if (!text.trim()) return;
+                    const doc = index.docs.length;
+                    index.docs.push([sceneId, position]);
+                    new Set(tokenize(text + " " + line.speaker)).forEach(token => {{
+                        (postings[token] = postings[token] || []).push(doc);
+                    }});
+                }});
+            }});
+            index.terms = Object.keys(postings).sort();
+            index.postings = index.terms.map(term => postings[term]);
+            return index;
+        }}
+
+        function loadSearchIndex() {{
+            if (!searchLoading) {{
+                searchLoading = fetch('{SEARCH_INDEX_FILE}')
+                    .then(response => {{
+                        if (!response.ok) throw new Error(response.status);
+                        return response.json();
+                    }})
+                    .then(index => {{
+                        index.postings = index.postings.map(decodeGaps);
+                        return index;
+                    }})
+                    .catch(() => buildSearchIndex())
+                    .then(index => searchIndex = index);
+            }}
+            return searchLoading;
+        }}
+
+        function lowerBound(terms, value) {{
+            let low = 0, high = terms.length;
+            while (low < high) {{
+                const middle = (low + high) >> 1;
+                if (terms[middle] < value) low = middle + 1; else high = middle;
+            }}
+            return low;
+        }}
+
+        function searchLines(query) {{
+            // Tous les mots doivent être présents ; le dernier peut être un début de mot
+            const tokens = tokenize(query);
+            if (!tokens.length) return [];
+            let found = null;
+            for (let position = 0; position < tokens.length; position++) {{
+                const token = tokens[position];
+                const first = lowerBound(searchIndex.terms, token);
+                let last = first;
+                if (position === tokens.length - 1) {{
+                    last = lowerBound(searchIndex.terms, token + '\\uffff');
+                }} else if (searchIndex.terms[first] === token) {{
+                    last = first + 1;
+                }}
+                const docs = new Set();
+                for (let termId = first; termId < last; termId++) {{
+                    searchIndex.postings[termId].forEach(doc => docs.add(doc));
+                }}
+                found = found === null ? docs : new Set([...found].filter(doc => docs.has(doc)));
+                if (!found.size) return [];
+            }}
+            return [...found].sort((a, b) => a - b)
+                .map(doc => [searchIndex.scenes[searchIndex.docs[doc][0]], searchIndex.docs[doc][1]]);
+        }}
+
+        function runSearch() {{
+            const query = document.getElementById('search-input').value;
+            loadSearchIndex().then(() => {{
+                // Une frappe plus récente a déjà relancé la recherche
+                if (document.getElementById('search-input').value !== query) return;
+                lastResults = searchLines(query).slice(0, MAX_SEARCH_RESULTS);
+                document.getElementById('search-results').innerHTML = lastResults.map(([sceneName, position], k) => {{
+                    const line = allScenesData[sceneName].dialogue[position];
+                    return `<div class="search-result" onclick="jumpTo(${{k}})"><b>${{sceneName.toUpperCase()}} #${{position + 1}}</b> ${{line.speaker}} : ${{line.text}}</div>`;
+                }}).join('');
+            }});
+        }}
+
+        function jumpTo(k) {{
+            const [sceneName, position] = lastResults[k];
+            const previousRole = roleSelect.value;
+            sceneSelect.value = sceneName;
+            updateRoles();
+            if (allScenesData[sceneName].roles.includes(previousRole)) roleSelect.value = previousRole;
+            startSelect.value = position;
+            document.getElementById('search-results').innerHTML = "";
+        }}
+
         audioPlayer.onerror = function() {{
             const err = "Erreur audio";
             console.error(err);
             document.getElementById('error-msg').innerText = err;
             document.getElementById('error-msg').style.display = 'block';
-            setTimeout(() => playLine(currentLineIndex + 1), 2000);
+            setTimeout(() => advance(currentLineIndex), 2000);
         }};
 
+        function updateTempo() {{
+            tempo = parseFloat(document.getElementById('tempo-range').value);
+            document.getElementById('tempo-value').innerText = tempo + "x";
+            // Changer de source remet playbackRate à defaultPlaybackRate
+            audioPlayer.defaultPlaybackRate = tempo;
+            audioPlayer.playbackRate = tempo;
+            audioPlayer.preservesPitch = audioPlayer.mozPreservesPitch = audioPlayer.webkitPreservesPitch = true;
+        }}
+
         function startRehearsal() {{
             const sceneName = sceneSelect.value;
             userRole = roleSelect.value;
@@ -467,6 +870,12 @@ async def generate_export():
             if (!sceneName || !userRole) return;
             
             currentSceneData = allScenesData[sceneName].dialogue;
+            startLine = parseInt(startSelect.value || "0", 10);
+            if (!ensembleMode && allScenesData[sceneName].cue_tails && document.getElementById('drill-check').checked) {{
+                startLine = buildDrill(allScenesData[sceneName].cues[userRole] || [], startLine);
+            }}
+            prefetchFrom(startLine);
+            updateTempo();
             
             document.getElementById('scene-title').innerText = sceneName.toUpperCase() + " // " + userRole;
             document.getElementById('setup').style.opacity = '0';
@@ -479,7 +888,101 @@ async def generate_export():
             
             renderScript();
             
-            setTimeout(() => playLine(0), 500);
+            if (ensembleMode) {{
+                connectEnsemble(sceneName);
+            }} else {{
+                setTimeout(() => playLine(startLine), 500);
+            }}
+        }}
+
+        function buildDrill(pairs, start) {{
+            // Chaque réplique du rôle, précédée de son signal : on ne joue rien d'autre
+            const order = [];
+            pairs.filter(pair => pair.line >= start).forEach(pair => {{
+                if (pair.cue !== null) order.push(pair.cue);
+                order.push(pair.line);
+            }});
+            drillNext = new Map();
+            order.forEach((index, position) => {{
+                drillNext.set(index, position + 1 < order.length ? order[position + 1] : currentSceneData.length);
+            }});
+            return order.length ? order[0] : currentSceneData.length;
+        }}
+
+        function nextLine(index) {{
+            return drillNext ? drillNext.get(index) : index + 1;
+        }}
+
+        function audioFor(line) {{
+            // En mode répliques seules, on ne joue que la fin du signal
+            return drillNext ? (line.cue_audio || line.audio) : line.audio;
+        }}
+
+        function prefetchFrom(index) {{
+            // Le navigateur télécharge les prochains extraits pendant la réplique en cours
+            const upcoming = new Map();
+            for (let i = index, n = 0; i < currentSceneData.length && n < PREFETCH_AHEAD; i = nextLine(i), n++) {{
+                const line = currentSceneData[i];
+                const src = audioFor(line);
+                if (!src || line.speaker === userRole) continue;
+                let clip = prefetched.get(src);
+                if (!clip) {{
+                    clip = new Audio();
+                    clip.preload = 'auto';
+                    clip.src = src;
+                }}
+                upcoming.set(src, clip);
+            }}
+            prefetched = upcoming;
+        }}
+
+        function connectEnsemble(sceneName) {{
+            const protocol = location.protocol === 'https:' ? 'wss://' : 'ws://';
+            ensembleSocket = new WebSocket(protocol + location.host + '/ws');
+            ensembleSocket.onopen = () => {{
+                ensembleSocket.send(JSON.stringify({{ type: "join", scene: sceneName, role: userRole }}));
+            }};
+            ensembleSocket.onmessage = (event) => {{
+                const msg = JSON.parse(event.data);
+                if (msg.type === "state") {{
+                    showEnsembleState(msg);
+                }} else if (msg.type === "cue") {{
+                    // Scène lancée (par cet appareil ou un autre) : le bouton ne doit plus envoyer "start"
+                    document.getElementById('action-btn').onclick = handleUserAction;
+                    playLine(msg.line, msg.turn);
+                }} else if (msg.type === "end") {{
+                    playLine(currentSceneData.length);
+                }} else if (msg.type === "error") {{
+                    alert(msg.message);
+                    location.reload();
+                }}
+            }};
+            ensembleSocket.onclose = () => {{
+                document.getElementById('error-msg').innerText = "Connexion au serveur perdue";
+                document.getElementById('error-msg').style.display = 'block';
+            }};
+        }}
+
+        function showEnsembleState(msg) {{
+            // Scène déjà lancée : la réplique courante arrive dans le message "cue"
+            if (msg.line !== null) return;
+            const btn = document.getElementById('action-btn');
+            document.getElementById('status').innerText = "EN SCÈNE : " + Object.keys(msg.claims).join(', ');
+            btn.innerText = "LANCER LA SCÈNE";
+            btn.className = "";
+            btn.disabled = false;
+            btn.onclick = () => {{
+                btn.disabled = true;
+                ensembleSocket.send(JSON.stringify({{ type: "start", line: startLine }}));
+            }};
+        }}
+
+        function advance(index) {{
+            if (ensembleSocket) {{
+                ensembleSocket.send(JSON.stringify({{ type: "done", line: index }}));
+            }} else {{
+                playLine(nextLine(index));
+            }}
         }}
 
         function renderScript() {{
@@ -487,6 +990,7 @@ async def generate_export():
             container.innerHTML = currentSceneData.map((line, index) => {{
                 const isUser = line.speaker === userRole;
                 const hiddenClass = isUser ? 'hidden-text' : '';
+                const skipped = drillNext && !drillNext.has(index) ? ' style="display:none"' : '';
                 
                 let actionHtml = '';
                 if (line.action) {{
@@ -494,7 +998,7 @@ async def generate_export():
                 }}
 
                 return `
-                <div class="line" id="line-${{index}}">
+                <div class="line" id="line-${{index}}"${{skipped}}>
                     <div class="speaker">${{line.speaker}}</div>
                     ${{actionHtml}}
                     <div class="text ${{hiddenClass}}">${{line.text}}</div>
@@ -515,7 +1019,7 @@ async def generate_export():
             }}
         }}
 
-        function playLine(index) {{
+        function playLine(index, turn) {{
             if (index >= currentSceneData.length) {{
                 document.getElementById('status').innerText = "FIN DE LA SCÈNE";
                 document.getElementById('action-btn').innerText = "Recommencer";
@@ -527,12 +1031,17 @@ async def generate_export():
 
             currentLineIndex = index;
             scrollToLine(index);
+            prefetchFrom(nextLine(index));
             const line = currentSceneData[index];
             const btn = document.getElementById('action-btn');
             const status = document.getElementById('status');
             document.getElementById('error-msg').style.display = 'none';
 
-            if (line.speaker === userRole) {{
+            // En solo, turn est indéfini : on donne la réplique nous-mêmes
+            const isUserLine = turn ? turn === "me" : line.speaker === userRole;
+            const shouldPlay = turn ? turn === "play" : true;
+
+            if (isUserLine) {{
                 isUserTurn = true;
                 userStep = "verify";
                 status.innerText = "C'EST À VOUS";
@@ -546,8 +1055,15 @@ async def generate_export():
                 btn.className = "";
                 btn.disabled = true;
 
-                if (line.audio) {{
-                    audioPlayer.src = line.audio;
+                if (!shouldPlay) {{
+                    // Un autre appareil donne cette réplique
+                    return;
+                }}
+
+                const audio = audioFor(line);
+                if (audio) {{
+                    audioPlayer.src = audio;
+                    audioPlayer.playbackRate = tempo;
                     const playPromise = audioPlayer.play();
                     if (playPromise !== undefined) {{
                         playPromise.then(_ => {{}}).catch(error => {{
@@ -563,9 +1079,9 @@ async def generate_export():
                             }};
                         }});
                     }}
-                    audioPlayer.onended = () => {{ playLine(index + 1); }};
+                    audioPlayer.onended = () => {{ advance(index); }};
                 }} else {{
-                    setTimeout(() => playLine(index + 1), 1500);
+                    setTimeout(() => advance(index), 1500 / tempo);
                 }}
             }}
         }}
@@ -580,19 +1096,23 @@ async def generate_export():
                 btn.className = "continue-mode";
                 userStep = "next";
             }} else {{
-                playLine(currentLineIndex + 1);
+                isUserTurn = false;
+                advance(currentLineIndex);
             }}
         }}
     </script>
 </body>
 </html>
     """
-    
-    with open(os.path.join(full_export_path, "index.html"), "w", encoding="utf-8") as f:
-        f.write(html_content)
-        
-    print(f"--- Export terminé avec succès ! ---")
-    print(f"Ouvrez ce fichier : {os.path.join(full_export_path, 'index.html')}")
+    return html_content
 
 if __name__ == "__main__":
-    asyncio.run(generate_export())
+    import argparse
+    parser = argparse.ArgumentParser(description="Export HTML/audio de toutes les scènes pour GitHub Pages.")
+    parser.add_argument("--plan", action="store_true",
+                        help="Estime les requêtes, la durée et la taille de l'export sans rien synthétiser")
+    args = parser.parse_args()
+    if args.plan:
+        plan_export()
+    else:
+        asyncio.run(generate_export())
@@ -0,0 +1,144 @@
+import re
+import bisect
+import unicodedata
+
+# Mots indexés pour la recherche (après pliage des accents)
+TOKEN = re.compile(r"[a-z0-9]+")
+
+# Fin de phrase : ponctuation forte (points de suspension compris) suivie d'une espace
+SENTENCE_END = re.compile(r'(?<=[.!?…])\s+')
+
+def clean_text(text):
+    """Retire les didascalies entre parenthèses, comme avant la synthèse vocale."""
+    return re.sub(r'\([^\)]+\)', '', text).strip()
+
+def is_spoken(line):
+    return bool(clean_text(line.get('text', '')))
+
+def last_sentence(text):
+    """Dernière phrase d'une réplique : c'est elle qui sert de signal au comédien."""
+    sentences = [s for s in SENTENCE_END.split(clean_text(text)) if s.strip()]
+    return sentences[-1].strip() if sentences else ""
+
+def build_cue_index(dialogue):
+    """Pour chaque rôle, la liste des paires {"cue": i, "line": j}.
+
+    j est une réplique du rôle, i la réplique parlée qui la précède si elle
+    appartient à un autre personnage (None en début de scène ou quand le rôle
+    enchaîne deux répliques).
+    """
+    index = {}
+    previous = None
+    for position, line in enumerate(dialogue):
+        if not is_spoken(line):
+            continue
+        speaker = line.get('speaker', 'UNKNOWN')
+        cue = previous if previous is not None and dialogue[previous].get('speaker') != speaker else None
+        index.setdefault(speaker, []).append({"cue": cue, "line": position})
+        previous = position
+    return index
+
+def find_role(index, role):
+    """Retrouve les paires d'un rôle sans tenir compte de la casse."""
+    for speaker, pairs in index.items():
+        if speaker.upper().strip() == role.upper().strip():
+            return pairs
+    return []
+
+def fold(text):
+    """Minuscules sans accents ni apostrophes typographiques, pour comparer du texte saisi."""
+    text = text.replace('’', "'").replace('œ', 'oe').replace('Œ', 'OE').replace('æ', 'ae').replace('Æ', 'AE')
+    decomposed = unicodedata.normalize('NFD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+def line_label(position, line, width=40):
+    """Étiquette courte d'une réplique : « 12. CAROLINE : Christelle arrête-toi ! »."""
+    text = clean_text(line.get('text', ''))
+    if len(text) > width:
+        text = text[:width].rstrip() + "…"
+    return f"{position + 1}. {line.get('speaker', 'UNKNOWN')} : {text}"
+
+def build_labels(dialogue):
+    """Étiquettes des répliques parlées, pour reprendre la scène où l'on veut."""
+    return [{"line": position, "label": line_label(position, line)}
+            for position, line in enumerate(dialogue) if is_spoken(line)]
+
+def find_line(dialogue, query):
+    """Première réplique contenant le texte cherché (sans tenir compte des accents), ou None."""
+    needle = fold(query).strip()
+    for position, line in enumerate(dialogue):
+        if needle and needle in fold(line.get('text', '')):
+            return position
+    return None
+
+def pairs_from(pairs, start):
+    """Paires d'un rôle à partir de la réplique start (la liste est triée par réplique)."""
+    return pairs[bisect.bisect_left([pair["line"] for pair in pairs], start):]
+
+# --- RECHERCHE ---
+
+def tokenize(text):
+    """Mots d'un texte français, sans accents ; les élisions (l', qu', m'...) sont écartées."""
+    return [token for token in TOKEN.findall(fold(text)) if len(token) > 1 and token != "qu"]
+
+def build_search_index(scenes):
+    """Index inversé de toutes les scènes ({nom: dialogue}), texte et personnages.
+
+    Chaque réplique parlée est un document ; "docs" donne sa position
+    [scène, réplique]. Les termes sont triés (recherche par préfixe) et leurs
+    listes de documents stockées en écarts successifs pour rester compactes.
+    """
+    names = list(scenes)
+    docs = []
+    postings = {}
+    for scene_id, name in enumerate(names):
+        for position, line in enumerate(scenes[name]):
+            if not is_spoken(line):
+                continue
+            doc = len(docs)
+            docs.append([scene_id, position])
+            for token in set(tokenize(clean_text(line.get('text', '')) + " " + line.get('speaker', ''))):
+                postings.setdefault(token, []).append(doc)
+
+    terms = sorted(postings)
+    encoded = []
+    for term in terms:
+        previous = 0
+        gaps = []
+        for doc in postings[term]:
+            gaps.append(doc - previous)
+            previous = doc
+        encoded.append(gaps)
+    return {"scenes": names, "docs": docs, "terms": terms, "postings": encoded}
+
+def _decode(gaps):
+    docs = []
+    current = 0
+    for gap in gaps:
+        current += gap
+        docs.append(current)
+    return docs
+
+def search(index, query):
+    """Répliques contenant tous les mots cherchés (le dernier peut être un début de mot).
+
+    Retourne une liste de (nom de scène, réplique) dans l'ordre de la pièce.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    terms = index["terms"]
+    found = None
+    for position, token in enumerate(tokens):
+        first = bisect.bisect_left(terms, token)
+        if position == len(tokens) - 1:
+            last = bisect.bisect_left(terms, token + "\uffff")
+        else:
+            last = first + 1 if first < len(terms) and terms[first] == token else first
+        docs = set()
+        for term_id in range(first, last):
+            docs.update(_decode(index["postings"][term_id]))
+        found = docs if found is None else found & docs
+        if not found:
+            return []
+    return [(index["scenes"][index["docs"][doc][0]], index["docs"][doc][1]) for doc in sorted(found)]
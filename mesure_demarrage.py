@@ -0,0 +1,34 @@
+import sys
+import time
+import subprocess
+
+# Budget de démarrage des modes texte (interpréteur compris)
+STARTUP_BUDGET = 0.2  # secondes
+RUNS = 5
+
+# Ce que fait repetition.py avant la première réplique, sans la pile audio
+PROBE = """
+import sys, repetition
+repetition.load_casting(repetition.CASTING_FILE)
+repetition.load_scene(sys.argv[1])
+heavy = [m for m in ("pygame", "edge_tts") if m in sys.modules]
+if heavy:
+    sys.exit("Modules audio chargés au démarrage : " + ", ".join(heavy))
+"""
+
+def measure(scene_path):
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", PROBE, scene_path], capture_output=True, text=True)
+        timings.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            print(result.stderr.strip())
+            return False
+    best = min(timings)
+    print(f"Démarrage (mode texte) : {best * 1000:.0f} ms (meilleur de {RUNS}), budget {STARTUP_BUDGET * 1000:.0f} ms")
+    return best <= STARTUP_BUDGET
+
+if __name__ == "__main__":
+    scene = sys.argv[1] if len(sys.argv) > 1 else "scenes/mariage.json"
+    sys.exit(0 if measure(scene) else 1)
@@ -0,0 +1,222 @@
+import os
+import re
+import struct
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+import tts
+from export_html import previous_clips
+from index_scene import clean_text, is_spoken, line_label
+from repetition import CASTING_FILE, get_voice_for_speaker, load_casting, load_scene
+
+# --- CONFIGURATION ---
+SCENES_DIR = "scenes"
+EXPORT_DIR = "docs"         # Extraits déjà exportés, réutilisés tels quels
+TRACKS_DIR = "pistes"
+DEFAULT_WORDS_PER_MINUTE = 150  # Débit de parole pour dimensionner vos silences
+MIN_SILENCE = 1.0           # secondes, même pour un « Oui. »
+LINE_GAP = 0.4              # secondes de silence entre deux répliques
+TTS_CONCURRENCY = 4         # connexions Edge TTS ouvertes pour les extraits manquants
+
+# En-tête des extraits Edge TTS (MPEG-2 Layer III, 24 kHz, 48 kbit/s, mono),
+# utilisé pour le silence si aucun extrait n'est disponible
+DEFAULT_FRAME_HEADER = bytes.fromhex("fff364c4")
+
+# --- MP3 ---
+
+BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],  # MPEG-1 Layer III
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],     # MPEG-2/2.5 Layer III
+}
+SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+def parse_header(header):
+    """Retourne (taille de trame, échantillons par trame, fréquence) d'une trame Layer III, ou None."""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x03   # 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+    layer = (header[1] >> 1) & 0x03      # 1 = Layer III
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = BITRATES[1 if version == 3 else 2][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][rate_index]
+    samples = 1152 if version == 3 else 576
+    return samples // 8 * bitrate // sample_rate + padding, samples, sample_rate
+
+def read_frames(data):
+    """Découpe un MP3 en trames audio (sans tag ID3 ni trame d'en-tête Xing/Info)."""
+    position = 0
+    if data[:3] == b"ID3":
+        size = data[6] << 21 | data[7] << 14 | data[8] << 7 | data[9]
+        position = 10 + size
+    frames = []
+    while position + 4 <= len(data):
+        info = parse_header(data[position:position + 4])
+        if info is None:
+            position += 1  # Resynchronisation sur la trame suivante
+            continue
+        frame = data[position:position + info[0]]
+        if b"Xing" not in frame[:40] and b"Info" not in frame[:40]:
+            frames.append(frame)
+        position += info[0]
+    return frames
+
+def silence_frames(header, seconds):
+    """Trames muettes au format de header : données principales vides, décodées comme du silence."""
+    header = bytes([header[0], header[1], header[2] & ~0x02, header[3]])  # sans octet de bourrage
+    size, samples, sample_rate = parse_header(header)
+    count = round(seconds * sample_rate / samples)
+    return [header + bytes(size - 4)] * count
+
+# --- CHAPITRES (ID3v2.4 CHAP/CTOC) ---
+
+def syncsafe(value):
+    return bytes([(value >> 21) & 0x7F, (value >> 14) & 0x7F, (value >> 7) & 0x7F, value & 0x7F])
+
+def id3_frame(frame_id, payload):
+    return frame_id.encode("ascii") + syncsafe(len(payload)) + b"\x00\x00" + payload
+
+def id3_text(frame_id, text):
+    return id3_frame(frame_id, b"\x03" + text.encode("utf-8"))  # 3 = UTF-8
+
+def id3_chapters(title, chapters):
+    """Tag ID3 avec un chapitre par réplique : [(titre, début ms, fin ms)]."""
+    frames = [id3_text("TIT2", title)]
+    ids = [f"ch{number}".encode("ascii") for number in range(len(chapters))]
+    if len(ids) <= 255:  # La table des matières compte ses entrées sur un octet
+        frames.append(id3_frame("CTOC", b"toc\x00" + b"\x03" + bytes([len(ids)])
+                                + b"".join(element + b"\x00" for element in ids)))
+    for element, (chapter_title, start, end) in zip(ids, chapters):
+        frames.append(id3_frame("CHAP", element + b"\x00" + struct.pack(">IIII", start, end, 0xFFFFFFFF, 0xFFFFFFFF)
+                                + id3_text("TIT2", chapter_title)))
+    body = b"".join(frames)
+    return b"ID3\x04\x00\x00" + syncsafe(len(body)) + body
+
+# --- RENDU D'UNE PISTE ---
+
+def render_track(title, entries, output_path, words_per_minute):
+    """Assemble une piste : extraits des partenaires, silences à la place de vos répliques.
+
+    entries : liste de (titre du chapitre, chemin de l'extrait ou None, nombre de mots).
+    Exécutée dans un processus séparé pour chaque (scène, rôle).
+    """
+    clips = {}
+    for _, path, _ in entries:
+        if path and path not in clips:
+            with open(path, "rb") as f:
+                clips[path] = read_frames(f.read())
+    header = next((frames[0][:4] for frames in clips.values() if frames), DEFAULT_FRAME_HEADER)
+    _, samples, sample_rate = parse_header(header)
+
+    audio = []
+    chapters = []
+    frame_count = 0
+    for chapter_title, path, words in entries:
+        start = frame_count
+        if path:
+            frames = clips[path]
+            if any(parse_header(frame[:4])[1:] != (samples, sample_rate) for frame in frames):
+                raise ValueError(f"{path} : format audio différent des autres extraits")
+        else:
+            frames = silence_frames(header, max(words * 60 / words_per_minute, MIN_SILENCE))
+        frames = frames + silence_frames(header, LINE_GAP)
+        audio.extend(frames)
+        frame_count += len(frames)
+        chapters.append((chapter_title, start * samples * 1000 // sample_rate,
+                         frame_count * samples * 1000 // sample_rate))
+
+    with open(output_path, "wb") as f:
+        f.write(id3_chapters(title, chapters))
+        f.write(b"".join(audio))
+    return output_path, frame_count * samples / sample_rate
+
+# --- PRÉPARATION ---
+
+async def collect_clips(scenes, config, export_dir):
+    """Un extrait par réplique parlée : l'export (même texte, même voix), sinon le cache, sinon une synthèse."""
+    exported = previous_clips(export_dir)
+    clips = {}
+    pending = {}
+    pool = tts.TTSPool(TTS_CONCURRENCY)
+
+    for scene_name, dialogue in scenes.items():
+        for position, line in enumerate(dialogue):
+            if not is_spoken(line):
+                continue
+            key = (clean_text(line["text"]), get_voice_for_speaker(line.get("speaker", ""), config))
+            if key in exported:
+                clips[(scene_name, position)] = exported[key]
+                continue
+            if key not in pending:
+                pending[key] = asyncio.ensure_future(tts.get_clip(*key, pool))
+            clips[(scene_name, position)] = pending[key]
+
+    if pending:
+        print(f"Synthèse de {len(pending)} extrait(s) manquant(s)...")
+    for location, clip in clips.items():
+        if isinstance(clip, asyncio.Future):
+            try:
+                clips[location] = await clip
+            except Exception as e:
+                print(f"  Erreur audio ({location[0]} #{location[1] + 1}) : {e}")
+                clips[location] = None
+    await pool.close()
+    return clips
+
+def track_entries(scene_name, dialogue, role, clips):
+    entries = []
+    for position, line in enumerate(dialogue):
+        if not is_spoken(line):
+            continue
+        label = line_label(position, line)
+        if line.get("speaker", "").upper() == role.upper():
+            entries.append(("À VOUS — " + label, None, len(clean_text(line["text"]).split())))
+        elif clips.get((scene_name, position)):
+            entries.append((label, clips[(scene_name, position)], 0))
+    return entries
+
+def render_all(scene_filter=None, role_filter=None, words_per_minute=DEFAULT_WORDS_PER_MINUTE, jobs=None):
+    config = load_casting(CASTING_FILE)
+    scenes = {}
+    for scene_file in sorted(f for f in os.listdir(SCENES_DIR) if f.endswith(".json")):
+        scene_name = os.path.splitext(scene_file)[0]
+        if scene_filter in (None, scene_name):
+            scenes[scene_name] = load_scene(os.path.join(SCENES_DIR, scene_file))
+    if not scenes:
+        print(f"Erreur : Aucune scène à rendre dans '{SCENES_DIR}'")
+        return
+
+    clips = asyncio.run(collect_clips(scenes, config, EXPORT_DIR))
+    os.makedirs(TRACKS_DIR, exist_ok=True)
+
+    work = []
+    for scene_name, dialogue in scenes.items():
+        roles = sorted(set(line.get("speaker", "UNKNOWN") for line in dialogue if is_spoken(line)))
+        for role in roles:
+            if role_filter and role.upper() != role_filter.upper():
+                continue
+            safe_name = re.sub(r'[^a-zA-Z0-9]', '_', f"{scene_name}_{role}")
+            work.append((f"{scene_name} — {role}", track_entries(scene_name, dialogue, role, clips),
+                         os.path.join(TRACKS_DIR, f"{safe_name}.mp3"), words_per_minute))
+
+    print(f"Rendu de {len(work)} piste(s)...")
+    # Une piste par processus : les scènes et les rôles sont rendus en parallèle
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(render_track, *args) for args in work]
+        for future in futures:
+            path, duration = future.result()
+            print(f"  -> {path} ({int(duration // 60)} min {int(duration % 60):02d} s)")
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Pistes audio de répétition, une par scène et par rôle.")
+    parser.add_argument("--scene", help="Une seule scène (nom du fichier sans .json)")
+    parser.add_argument("--role", help="Un seul rôle")
+    parser.add_argument("--debit", type=int, default=DEFAULT_WORDS_PER_MINUTE,
+                        help="Votre débit de parole en mots par minute (durée des silences)")
+    parser.add_argument("--jobs", type=int, help="Nombre de processus (défaut : nombre de cœurs)")
+    args = parser.parse_args()
+    render_all(args.scene, args.role, args.debit, args.jobs)
@@ -0,0 +1,47 @@
+import os
+import sys
+import json
+from index_scene import build_search_index, line_label, search
+
+SCENES_DIR = "scenes"
+SEARCH_INDEX_FILE = os.path.join("docs", "search.json")  # Produit par export_html.py
+
+def load_scenes():
+    scenes = {}
+    for scene_file in sorted(f for f in os.listdir(SCENES_DIR) if f.endswith(".json")):
+        with open(os.path.join(SCENES_DIR, scene_file), 'r', encoding='utf-8') as f:
+            scenes[os.path.splitext(scene_file)[0]] = json.load(f)
+    return scenes
+
+def load_index(scenes):
+    """Index de l'export s'il est à jour, sinon reconstruit à partir des scènes (c'est rapide)."""
+    if os.path.exists(SEARCH_INDEX_FILE):
+        # Une scène modifiée après l'export : les positions de l'index ne sont plus les bonnes
+        exported_at = os.path.getmtime(SEARCH_INDEX_FILE)
+        if all(os.path.getmtime(os.path.join(SCENES_DIR, f"{name}.json")) <= exported_at for name in scenes):
+            with open(SEARCH_INDEX_FILE, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if set(index["scenes"]) == set(scenes):
+                return index
+    return build_search_index(scenes)
+
+def main(query):
+    scenes = load_scenes()
+    results = search(load_index(scenes), query)
+    if not results:
+        print(f"Aucune réplique ne contient \"{query}\".")
+        return
+
+    print(f"{len(results)} réplique(s) trouvée(s) :")
+    for scene_name, position in results:
+        print(f"  [{scene_name}] {line_label(position, scenes[scene_name][position], width=70)}")
+
+    scene_name, position = results[0]
+    print("\nPour répéter à partir de là :")
+    print(f"  python repetition.py {SCENES_DIR}/{scene_name}.json <NOM_DU_PERSONNAGE> --from {position + 1}")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage : python recherche.py <texte à chercher>")
+    else:
+        main(" ".join(sys.argv[1:]))
@@ -1,14 +1,26 @@
-import sys
 import re
 import os
 import json
 import asyncio
-import edge_tts
-import pygame
+from array import array
+import tts
+import time_stretch
+from index_scene import build_cue_index, clean_text, find_line, find_role, last_sentence, line_label, pairs_from
+
+# pygame et la connexion Edge TTS sont chargés à la demande (voir ensure_audio et tts.py) :
+# les modes texte démarrent sans charger la pile audio.
 
 # Fichier de configuration par défaut
 CASTING_FILE = "casting.json"
 
+# Mode silencieux : temps laissé pour lire une réplique du partenaire
+SILENT_WORDS_PER_SECOND = 3.0
+SILENT_MIN_DELAY = 0.5
+
+# Le module audio, chargé au premier besoin, et la connexion Edge TTS gardée ouverte
+_audio = None
+_tts_pool = None
+
 # Configuration par défaut si le fichier est absent
 DEFAULT_CONFIG = {
     "default_voice": "fr-FR-DeniseNeural",
@@ -98,18 +110,54 @@ def load_scene(filepath):
     else:
         return parse_txt_scene(filepath)
 
-async def speak_edge(text, voice):
-    """Génère l'audio avec Edge TTS et le joue avec Pygame."""
+def ensure_audio():
+    """Importe pygame puis initialise le mixer, une seule fois.
+
+    Lève une exception si aucun périphérique audio n'est disponible.
+    """
+    global _audio
+    if _audio is None:
+        os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+        import pygame
+        pygame.mixer.init()
+        _audio = pygame
+    return _audio
+
+def reading_delay(text):
+    """Durée de lecture estimée d'une réplique, en secondes."""
+    return max(len(text.split()) / SILENT_WORDS_PER_SECOND, SILENT_MIN_DELAY)
+
+def clip_at_tempo(path, tempo):
+    """Version accélérée d'un extrait (pygame ne sait pas le faire à la lecture).
+
+    Calculée une fois, puis gardée à côté de l'extrait dans le cache.
+    """
+    if tempo == 1.0:
+        return path
+    variant = time_stretch.variant_path(path, tempo)
+    if not os.path.exists(variant):
+        pygame = ensure_audio()
+        sample_rate, size, channels = pygame.mixer.get_init()
+        if size != -16:
+            return path  # Format du mixer inattendu : vitesse normale
+        # Les extraits Edge TTS sont mono : un seul canal suffit
+        samples = array('h', pygame.mixer.Sound(path).get_raw())[::channels]
+        time_stretch.write_wav(variant, time_stretch.stretch(samples, sample_rate, tempo), sample_rate)
+    return variant
+
+async def speak_edge(text, voice, tempo=1.0):
+    """Génère l'audio avec Edge TTS (ou le reprend du cache) et le joue avec Pygame."""
     # Nettoyage supplémentaire au cas où (même si le JSON est censé être propre)
-    text_clean = re.sub(r'\([^\)]+\)', '', text)
+    text_clean = clean_text(text)
     if not text_clean.strip():
         return
 
-    output_file = "temp_speech.mp3"
-    
+    global _tts_pool
     try:
-        communicate = edge_tts.Communicate(text_clean, voice)
-        await communicate.save(output_file)
+        pygame = ensure_audio()
+        if _tts_pool is None:
+            _tts_pool = tts.TTSPool(1)  # Une seule connexion, réutilisée d'une réplique à l'autre
+        output_file = clip_at_tempo(await tts.get_clip(text_clean, voice, _tts_pool), tempo)
 
         pygame.mixer.music.load(output_file)
         pygame.mixer.music.play()
@@ -122,46 +170,120 @@ async def speak_edge(text, voice):
     except Exception as e:
         print(f"(Erreur audio : {e})")
 
-async def rehearse_async(filepath, my_role):
+async def give_line(speaker, text, config, with_audio, tempo=1.0):
+    """Donne la réplique d'un partenaire : à voix haute, ou affichée le temps de la lire."""
+    if with_audio:
+        voice = get_voice_for_speaker(speaker, config)
+        print(f"\n[{speaker}] ({voice}) : {text}")
+        await speak_edge(text, voice, tempo)
+    else:
+        print(f"\n[{speaker}] : {text}")
+        await asyncio.sleep(reading_delay(text) / tempo)
+
+def my_turn(speaker, text):
+    print(f"\n[{speaker}] (C'est à vous !)")
+    input("Appuyez sur Entrée après avoir dit votre texte...")
+    print(f"   -> Vous deviez dire : \"{text}\"")
+
+async def rehearse_async(filepath, my_role, silent=False, cues_only=False, drill=False, start=0, start_cue=None,
+                         tempo=1.0):
+    """Fait répéter un rôle.
+
+    silent : les répliques des partenaires sont affichées, avec une pause de lecture.
+    cues_only : seule la réplique qui précède chacune des vôtres est donnée, sans audio.
+    drill : seule la dernière phrase de cette réplique est donnée, à voix haute
+    (ou affichée avec silent).
+    start / start_cue : reprise à une réplique (index) ou à la première qui contient ce texte.
+    tempo : vitesse des répliques des partenaires (1.0 à 2.0), sans changer la hauteur des voix.
+    """
     if not os.path.exists(filepath):
         print(f"Erreur : Le fichier {filepath} n'existe pas.")
         return
 
     config = load_casting(CASTING_FILE)
-    pygame.mixer.init()
+    with_audio = not (silent or cues_only)
 
     print(f"--- Répétition pour le rôle de : {my_role} ---")
     print(f"--- Scène : {filepath} ---")
+    if tempo != 1.0:
+        print(f"--- Tempo des partenaires : {tempo:g}x ---")
     
     dialogue = load_scene(filepath)
+    cue_index = build_cue_index(dialogue)
     my_role = my_role.upper()
 
-    for line in dialogue:
-        speaker = line.get('speaker', 'INCONNU')
-        text = line.get('text', '')
-        
-        # On ignore les lignes sans texte (didascalies pures en JSON)
-        if not text.strip():
-            continue
-
-        if speaker.upper() == my_role:
-            print(f"\n[{speaker}] (C'est à vous !)")
-            input("Appuyez sur Entrée après avoir dit votre texte...")
-            print(f"   -> Vous deviez dire : \"{text}\"")
-        else:
-            voice = get_voice_for_speaker(speaker, config)
-            print(f"\n[{speaker}] ({voice}) : {text}")
-            await speak_edge(text, voice)
+    if start_cue:
+        start = find_line(dialogue, start_cue)
+        if start is None:
+            print(f"Erreur : Aucune réplique ne contient \"{start_cue}\".")
+            return
+    if not 0 <= start < len(dialogue):
+        print(f"Erreur : La scène compte {len(dialogue)} répliques.")
+        return
+    if start:
+        print(f"--- Reprise à la réplique {line_label(start, dialogue[start])} ---")
+
+    if with_audio:
+        try:
+            ensure_audio()
+        except Exception as e:
+            print(f"Audio indisponible ({e}) : passage en mode silencieux.")
+            with_audio = False
 
-    if os.path.exists("temp_speech.mp3"):
-        try: os.remove("temp_speech.mp3")
-        except: pass
+    if cues_only or drill:
+        # On saute directement d'une réplique à l'autre grâce à l'index du rôle
+        for pair in pairs_from(find_role(cue_index, my_role), start):
+            line = dialogue[pair["line"]]
+            if pair["cue"] is not None:
+                cue = dialogue[pair["cue"]]
+                cue_speaker = cue.get('speaker', 'INCONNU')
+                if drill:
+                    await give_line(cue_speaker, last_sentence(cue.get('text', '')), config, with_audio, tempo)
+                else:
+                    print(f"\n[{cue_speaker}] : {cue.get('text', '')}")
+            my_turn(line.get('speaker', 'INCONNU'), line.get('text', ''))
+    else:
+        for line in dialogue[start:]:
+            speaker = line.get('speaker', 'INCONNU')
+            text = line.get('text', '')
+
+            # On ignore les lignes sans texte (didascalies pures en JSON)
+            if not text.strip():
+                continue
 
-def rehearse(filepath, my_role):
-    asyncio.run(rehearse_async(filepath, my_role))
+            if speaker.upper() == my_role:
+                my_turn(speaker, text)
+            else:
+                await give_line(speaker, text, config, with_audio, tempo)
+
+    global _tts_pool
+    if _tts_pool is not None:
+        await _tts_pool.close()
+        _tts_pool = None
+
+def rehearse(filepath, my_role, silent=False, cues_only=False, drill=False, start=0, start_cue=None, tempo=1.0):
+    asyncio.run(rehearse_async(filepath, my_role, silent, cues_only, drill, start, start_cue, tempo))
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage : python repetition.py <fichier_scene.json|txt> <nom_du_personnage>")
-    else:
-        rehearse(sys.argv[1], sys.argv[2])
+    import argparse
+    parser = argparse.ArgumentParser(description="Répétition interactive d'un rôle.")
+    parser.add_argument("scene", help="Fichier de scène (.json ou .txt)")
+    parser.add_argument("role", help="Nom du personnage à répéter")
+    parser.add_argument("--silent", action="store_true",
+                        help="Sans audio : les répliques des partenaires sont affichées")
+    parser.add_argument("--cues-only", action="store_true",
+                        help="Sans audio : seulement la réplique qui précède chacune des vôtres")
+    parser.add_argument("--drill", action="store_true",
+                        help="Seulement la dernière phrase de la réplique qui précède chacune des vôtres")
+    start_group = parser.add_mutually_exclusive_group()
+    start_group.add_argument("--from", dest="start", type=int, default=1, metavar="LINE",
+                             help="Commencer à la réplique numéro LINE (à partir de 1)")
+    start_group.add_argument("--from-cue", dest="start_cue", metavar="TEXTE",
+                             help="Commencer à la première réplique qui contient ce texte")
+    parser.add_argument("--tempo", type=float, default=1.0,
+                        help=f"Vitesse des répliques des partenaires, de {time_stretch.MIN_TEMPO} à {time_stretch.MAX_TEMPO} "
+                             "(ex. 1.5 ; la hauteur des voix ne change pas)")
+    args = parser.parse_args()
+    if not time_stretch.MIN_TEMPO <= args.tempo <= time_stretch.MAX_TEMPO:
+        parser.error(f"--tempo doit être compris entre {time_stretch.MIN_TEMPO} et {time_stretch.MAX_TEMPO}")
+    rehearse(args.scene, args.role, args.silent, args.cues_only, args.drill, args.start - 1, args.start_cue, args.tempo)
@@ -0,0 +1,309 @@
+import os
+import re
+import gzip
+import json
+import asyncio
+import hashlib
+import mimetypes
+from aiohttp import web, WSMsgType
+
+# --- CONFIGURATION ---
+EXPORT_DIR = "docs"  # Dossier produit par export_html.py
+SCENES_DATA_FILE = "scenes.json"
+DEFAULT_HOST = "0.0.0.0"
+DEFAULT_PORT = 8000
+
+# Types de contenu qui gagnent à être compressés (les MP3 le sont déjà)
+COMPRESSIBLE_TYPES = ("text/html", "application/json", "text/css", "application/javascript")
+
+# --- FICHIERS STATIQUES ---
+
+class Asset:
+    """Fichier de l'export gardé en mémoire, avec son ETag et sa version gzip."""
+
+    def __init__(self, body, content_type):
+        self.body = body
+        self.content_type = content_type
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        self.gzip_body = None
+        if content_type in COMPRESSIBLE_TYPES:
+            self.gzip_body = gzip.compress(body, compresslevel=6)
+
+def load_assets(export_path):
+    """Charge tout l'export en mémoire : aucune lecture disque pendant la répétition."""
+    assets = {}
+    for root, _, files in os.walk(export_path):
+        for name in files:
+            full_path = os.path.join(root, name)
+            rel_path = os.path.relpath(full_path, export_path).replace(os.sep, "/")
+            content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            with open(full_path, 'rb') as f:
+                assets[rel_path] = Asset(f.read(), content_type)
+    return assets
+
+def parse_range(header, size):
+    """Analyse un en-tête Range 'bytes=a-b' et retourne (début, fin incluse).
+
+    Retourne None si l'en-tête est absent ou ignoré (plages multiples),
+    lève ValueError si la plage ne peut pas être satisfaite.
+    """
+    match = re.fullmatch(r'\s*bytes=(\d*)-(\d*)\s*', header or "")
+    if not match:
+        return None
+    start, end = match.groups()
+    if (not start and not end) or size == 0:
+        raise ValueError(header)  # Un fichier vide n'a aucun octet à servir
+    if not start:
+        # Suffixe : les N derniers octets
+        length = int(end)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+async def handle_asset(request):
+    path = request.match_info.get("path") or "index.html"
+    asset = request.app["assets"].get(path)
+    if asset is None:
+        raise web.HTTPNotFound()
+
+    headers = {
+        "ETag": asset.etag,
+        "Cache-Control": "no-cache",
+        "Accept-Ranges": "bytes",
+    }
+    if asset.gzip_body is not None:
+        headers["Vary"] = "Accept-Encoding"
+
+    if etag_matches(request.headers.get("If-None-Match"), asset.etag):
+        return web.Response(status=304, headers=headers)
+
+    size = len(asset.body)
+    try:
+        byte_range = parse_range(request.headers.get("Range"), size)
+    except ValueError:
+        headers["Content-Range"] = f"bytes */{size}"
+        return web.Response(status=416, headers=headers)
+
+    if byte_range is not None:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return web.Response(status=206, body=asset.body[start:end + 1],
+                            content_type=asset.content_type, headers=headers)
+
+    if asset.gzip_body is not None and "gzip" in request.headers.get("Accept-Encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return web.Response(body=asset.gzip_body, content_type=asset.content_type, headers=headers)
+
+    return web.Response(body=asset.body, content_type=asset.content_type, headers=headers)
+
+async def handle_root(request):
+    # La page exportée passe en mode ensemble grâce au paramètre ?ensemble
+    raise web.HTTPFound("/index.html?ensemble=1")
+
+# --- SESSION DE RÉPÉTITION PARTAGÉE ---
+
+class Client:
+    def __init__(self, ws):
+        self.ws = ws
+        self.role = None
+
+class Session:
+    """Une scène répétée à plusieurs : chaque appareil tient un rôle, le serveur tient la réplique courante.
+
+    Les répliques d'un rôle non attribué sont jouées par l'appareil « hôte »
+    (le premier connecté), qui prévient le serveur à la fin de l'audio.
+    """
+
+    def __init__(self, scene_name, scene_data):
+        self.scene_name = scene_name
+        self.dialogue = scene_data["dialogue"]
+        self.roles = scene_data["roles"]
+        self.clients = []
+        self.line = None  # None tant que la scène n'est pas lancée
+
+    @property
+    def host(self):
+        return self.clients[0] if self.clients else None
+
+    def claims(self):
+        return {c.role: True for c in self.clients if c.role}
+
+    def owner_of(self, index):
+        speaker = self.dialogue[index].get("speaker")
+        for client in self.clients:
+            if client.role == speaker:
+                return client
+        return None
+
+    def join(self, client, role):
+        if role:
+            if role not in self.roles:
+                raise ValueError(f"Rôle inconnu dans cette scène : {role}")
+            if role in self.claims():
+                raise ValueError(f"Le rôle {role} est déjà pris")
+        client.role = role or None
+        self.clients.append(client)
+
+    def leave(self, client):
+        if client in self.clients:
+            self.clients.remove(client)
+
+    def turn_for(self, client, index):
+        owner = self.owner_of(index)
+        if owner is client:
+            return "me"
+        if owner is None and client is self.host:
+            return "play"
+        return "wait"
+
+    def can_advance(self, client, index):
+        if self.line is None or index != self.line or self.line >= len(self.dialogue):
+            # Message en retard, en double ou après la fin : on l'ignore
+            return False
+        return self.turn_for(client, index) in ("me", "play")
+
+    async def send(self, client, message):
+        try:
+            await client.ws.send_str(json.dumps(message, ensure_ascii=False))
+        except (ConnectionError, RuntimeError):
+            pass
+
+    async def broadcast_state(self):
+        await asyncio.gather(*(self.send(c, {
+            "type": "state",
+            "scene": self.scene_name,
+            "role": c.role,
+            "host": c is self.host,
+            "claims": self.claims(),
+            "line": self.line,
+        }) for c in self.clients))
+
+    def cue_for(self, client):
+        if self.line >= len(self.dialogue):
+            return {"type": "end"}
+        return {"type": "cue", "line": self.line, "turn": self.turn_for(client, self.line)}
+
+    async def broadcast_cue(self):
+        await asyncio.gather(*(self.send(c, self.cue_for(c)) for c in self.clients))
+
+    async def start(self, line=0):
+        if self.line is not None and self.line < len(self.dialogue):
+            return  # Scène en cours : un "start" en retard ne doit pas la relancer
+        # Reprise possible à n'importe quelle réplique de la scène
+        self.line = line if isinstance(line, int) and 0 <= line < len(self.dialogue) else 0
+        await self.broadcast_cue()
+
+    async def advance(self, client, index):
+        if not self.can_advance(client, index):
+            return
+        self.line += 1
+        await self.broadcast_cue()
+        if self.line >= len(self.dialogue):
+            # Fin de scène envoyée : la session redevient « pas lancée » pour pouvoir rejouer
+            self.line = None
+
+async def handle_ws(request):
+    ws = web.WebSocketResponse(heartbeat=20)
+    await ws.prepare(request)
+
+    client = Client(ws)
+    session = None
+    sessions = request.app["sessions"]
+
+    try:
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            try:
+                data = json.loads(msg.data)
+            except ValueError:
+                continue
+            if not isinstance(data, dict):
+                continue
+            kind = data.get("type")
+
+            if kind == "join" and session is None:
+                scene_name = data.get("scene")
+                scene_data = request.app["scenes"].get(scene_name)
+                if scene_data is None:
+                    await ws.send_json({"type": "error", "message": f"Scène inconnue : {scene_name}"})
+                    continue
+                if scene_name not in sessions:
+                    sessions[scene_name] = Session(scene_name, scene_data)
+                try:
+                    sessions[scene_name].join(client, data.get("role"))
+                except ValueError as e:
+                    await ws.send_json({"type": "error", "message": str(e)})
+                    continue
+                session = sessions[scene_name]
+                await session.broadcast_state()
+                if session.line is not None:
+                    # Arrivée en cours de scène : on rejoint directement la réplique courante
+                    await session.send(client, session.cue_for(client))
+            elif session is None:
+                continue
+            elif kind == "start":
+                await session.start(data.get("line", 0))
+            elif kind == "done":
+                await session.advance(client, data.get("line"))
+    finally:
+        if session is not None:
+            session.leave(client)
+            if session.clients:
+                # Le rôle libéré (ou l'hôte) a pu changer : on resynchronise tout le monde
+                await session.broadcast_state()
+                if session.line is not None:
+                    await session.broadcast_cue()
+            else:
+                sessions.pop(session.scene_name, None)
+    return ws
+
+# --- APPLICATION ---
+
+def create_app(export_dir=EXPORT_DIR):
+    export_path = os.path.abspath(export_dir)
+    scenes_path = os.path.join(export_path, SCENES_DATA_FILE)
+    if not os.path.exists(scenes_path):
+        raise FileNotFoundError(f"{scenes_path} introuvable : lancez d'abord export_html.py")
+
+    with open(scenes_path, 'r', encoding='utf-8') as f:
+        scenes = json.load(f)
+
+    app = web.Application()
+    app["assets"] = load_assets(export_path)
+    app["scenes"] = scenes
+    app["sessions"] = {}
+    app.router.add_get("/", handle_root)
+    app.router.add_get("/ws", handle_ws)
+    app.router.add_get("/{path:.+}", handle_asset)
+    return app
+
+def serve(export_dir=EXPORT_DIR, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    try:
+        app = create_app(export_dir)
+    except FileNotFoundError as e:
+        print(f"Erreur : {e}")
+        return
+    print(f"--- Serveur de répétition : {len(app['scenes'])} scènes, {len(app['assets'])} fichiers en mémoire ---")
+    print(f"Sur chaque appareil du même réseau, ouvrez : http://<adresse-de-cet-ordinateur>:{port}/")
+    web.run_app(app, host=host, port=port, print=None)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Répétition à plusieurs appareils sur le réseau local.")
+    parser.add_argument("export_dir", nargs="?", default=EXPORT_DIR, help="Dossier exporté (défaut : docs)")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    serve(args.export_dir, args.host, args.port)
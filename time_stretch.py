@@ -0,0 +1,66 @@
+import os
+import wave
+import math
+import operator
+from array import array
+
+# Accélération des répliques des partenaires sans changer la hauteur de la voix (WSOLA) :
+# des fenêtres du signal sont recopiées avec un pas plus court, chacune recalée
+# sur la forme d'onde de la précédente pour éviter les clics et l'effet d'écho.
+
+MIN_TEMPO = 1.0
+MAX_TEMPO = 2.0
+
+WINDOW_SECONDS = 0.04      # longueur d'une fenêtre recopiée
+TOLERANCE_SECONDS = 0.01   # décalage maximal pour recaler une fenêtre
+SEARCH_STEP = 8            # le recalage compare un échantillon sur SEARCH_STEP
+
+def stretch(samples, sample_rate, tempo):
+    """Retourne samples (array 'h', mono) joué tempo fois plus vite, à hauteur égale."""
+    if tempo == 1.0 or len(samples) == 0:
+        return array('h', samples)
+    size = int(sample_rate * WINDOW_SECONDS) // 2 * 2
+    hop = size // 2                     # pas de recopie en sortie
+    tolerance = int(sample_rate * TOLERANCE_SECONDS)
+    # Fenêtre de Hann périodique : deux fenêtres décalées d'un demi-pas somment à 1
+    window = [0.5 - 0.5 * math.cos(2 * math.pi * n / size) for n in range(size)]
+
+    padded = list(samples) + [0] * (size + tolerance + hop)
+    coarse = padded[::SEARCH_STEP]
+    coarse_size = size // SEARCH_STEP
+    coarse_tolerance = tolerance // SEARCH_STEP
+
+    frames = int(len(samples) / (hop * tempo)) + 1
+    output = [0.0] * (frames * hop + size)
+    position = 0
+    for frame in range(frames):
+        if frame:
+            # Prolongement naturel de la fenêtre précédente : la nouvelle doit lui ressembler
+            target = coarse[(position + hop) // SEARCH_STEP:(position + hop) // SEARCH_STEP + coarse_size]
+            expected = int(frame * hop * tempo) // SEARCH_STEP
+            best, best_score = expected, None
+            for candidate in range(max(expected - coarse_tolerance, 0), expected + coarse_tolerance + 1):
+                score = sum(map(operator.mul, coarse[candidate:candidate + coarse_size], target))
+                if best_score is None or score > best_score:
+                    best, best_score = candidate, score
+            position = best * SEARCH_STEP
+        start = frame * hop
+        output[start:start + size] = map(operator.add, output[start:start + size],
+                                         map(operator.mul, window, padded[position:position + size]))
+
+    # Les poids des fenêtres sont positifs et somment à 1 : pas de dépassement possible
+    return array('h', map(int, output[:int(len(samples) / tempo)]))
+
+def variant_path(path, tempo):
+    """Chemin de la version accélérée d'un extrait, rangée à côté de lui."""
+    return f"{os.path.splitext(path)[0]}_{tempo:.2f}x.wav"
+
+def write_wav(path, samples, sample_rate):
+    # Écriture dans un fichier temporaire : une variante interrompue n'est pas réutilisée
+    partial = f"{path}.{os.getpid()}.part"
+    with wave.open(partial, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.tobytes())
+    os.replace(partial, path)
@@ -0,0 +1,212 @@
+import os
+import shutil
+import hashlib
+import asyncio
+
+# aiohttp et edge_tts sont importés à la connexion : importer ce module reste gratuit
+# (repetition.py en dépend dès le démarrage).
+#
+# TTSSession réutilise des fonctions internes d'edge_tts (communicate._SSL_CTX,
+# split_text_by_byte_length, mkssml, ssml_headers_plus_data, TTSConfig) :
+# requirements.txt fixe la version pour laquelle ce code a été écrit (7.3.1).
+# Vérifier ces imports avant de changer de version.
+
+# Extraits déjà synthétisés, indexés par (voix, texte) : on ne paie Edge TTS qu'une fois
+CACHE_DIR = "cache_tts"
+
+# Connexions ouvertes en parallèle par défaut, et tentatives par extrait
+POOL_SIZE = 4
+MAX_ATTEMPTS = 3
+
+SPEECH_CONFIG = (
+    "Content-Type:application/json; charset=utf-8\r\n"
+    "Path:speech.config\r\n\r\n"
+    '{"context":{"synthesis":{"audio":{"metadataoptions":{'
+    '"sentenceBoundaryEnabled":"false","wordBoundaryEnabled":"false"},'
+    '"outputFormat":"audio-24khz-48kbitrate-mono-mp3"}}}}\r\n'
+)
+
+# --- CONNEXIONS ---
+
+def parse_headers(block):
+    headers = {}
+    for line in block.split(b"\r\n"):
+        if b":" in line:
+            key, value = line.split(b":", 1)
+            headers[key] = value
+    return headers
+
+class TTSSession:
+    """Une connexion WebSocket au service Edge TTS, gardée ouverte d'une réplique à l'autre.
+
+    edge_tts.Communicate ouvre une connexion (poignée de main TLS comprise) par
+    texte ; ici la connexion et la configuration ne sont payées qu'une fois.
+    url permet de viser un serveur de substitution (voir bench_tts.py).
+    """
+
+    def __init__(self, url=None):
+        self.url = url
+        self.http = None
+        self.ws = None
+
+    @property
+    def connected(self):
+        return self.ws is not None and not self.ws.closed
+
+    async def connect(self):
+        import aiohttp
+        from edge_tts import communicate as edge
+        from edge_tts.constants import SEC_MS_GEC_VERSION, WSS_HEADERS, WSS_URL
+        from edge_tts.drm import DRM
+
+        await self.close()
+        self.http = aiohttp.ClientSession(
+            trust_env=True,
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60),
+        )
+        if self.url:
+            self.ws = await self.http.ws_connect(self.url)
+        else:
+            self.ws = await self.http.ws_connect(
+                f"{WSS_URL}&ConnectionId={edge.connect_id()}"
+                f"&Sec-MS-GEC={DRM.generate_sec_ms_gec()}"
+                f"&Sec-MS-GEC-Version={SEC_MS_GEC_VERSION}",
+                compress=15,
+                headers=DRM.headers_with_muid(WSS_HEADERS),
+                ssl=edge._SSL_CTX,
+            )
+        await self.ws.send_str(f"X-Timestamp:{edge.date_to_string()}\r\n" + SPEECH_CONFIG)
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+        if self.http is not None:
+            await self.http.close()
+        self.ws = None
+        self.http = None
+
+    async def synthesize(self, text, voice):
+        """Retourne le MP3 de text dit par voice. Lève ConnectionError si la connexion tombe."""
+        import aiohttp
+        from xml.sax.saxutils import escape
+        from edge_tts import communicate as edge
+        from edge_tts.data_classes import TTSConfig
+
+        config = TTSConfig(voice, "+0%", "+0%", "+0Hz", "SentenceBoundary")
+        audio = bytearray()
+        for chunk in edge.split_text_by_byte_length(escape(edge.remove_incompatible_characters(text)), 4096):
+            await self.ws.send_str(edge.ssml_headers_plus_data(
+                edge.connect_id(), edge.date_to_string(), edge.mkssml(config, chunk)))
+            async for received in self.ws:
+                if received.type == aiohttp.WSMsgType.TEXT:
+                    block = received.data.encode("utf-8").split(b"\r\n\r\n", 1)[0]
+                    if parse_headers(block).get(b"Path") == b"turn.end":
+                        break
+                elif received.type == aiohttp.WSMsgType.BINARY:
+                    header_length = int.from_bytes(received.data[:2], "big")
+                    headers = parse_headers(received.data[2:2 + header_length])
+                    if headers.get(b"Path") == b"audio" and headers.get(b"Content-Type") == b"audio/mpeg":
+                        audio += received.data[2 + header_length:]
+                else:
+                    raise ConnectionError(f"Erreur de connexion : {received.data}")
+            else:
+                raise ConnectionError("Connexion fermée par le service")
+        if not audio:
+            raise ValueError(f"Aucun audio reçu (voix '{voice}' inconnue ?)")
+        return bytes(audio)
+
+class TTSPool:
+    """Réserve de connexions chaudes, partagées entre répliques et scènes.
+
+    Au plus size synthèses en parallèle ; une connexion tombée est rouverte
+    et la réplique relancée, sans que l'appelant ne s'en aperçoive.
+    """
+
+    def __init__(self, size=POOL_SIZE, url=None):
+        self.url = url
+        self.slots = asyncio.Semaphore(size)
+        self.idle = []
+        self.connections = 0  # Connexions ouvertes depuis la création (mesure)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def synthesize(self, text, voice):
+        import aiohttp
+        async with self.slots:
+            session = self.idle.pop() if self.idle else TTSSession(self.url)
+            try:
+                for attempt in range(MAX_ATTEMPTS):
+                    try:
+                        if not session.connected:
+                            self.connections += 1
+                            await session.connect()
+                        return await session.synthesize(text, voice)
+                    except (ConnectionError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        await session.close()
+                        if isinstance(e, aiohttp.ClientResponseError) and e.status == 403 and not self.url:
+                            # Horloge décalée par rapport au service : edge_tts sait corriger
+                            from edge_tts.drm import DRM
+                            DRM.handle_client_response_error(e)
+                        if attempt == MAX_ATTEMPTS - 1:
+                            raise
+                    except BaseException:
+                        # Tour interrompu : des messages de ce tour pourraient encore arriver
+                        await session.close()
+                        raise
+            finally:
+                self.idle.append(session)
+
+    async def close(self):
+        for session in self.idle:
+            await session.close()
+        self.idle = []
+
+# --- CACHE ---
+
+def cache_path(text, voice):
+    digest = hashlib.sha1(f"{voice}\n{text}".encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, f"{digest}.mp3")
+
+def is_cached(text, voice):
+    return os.path.exists(cache_path(text, voice))
+
+def store_clip(text, voice, source):
+    """Range dans le cache un extrait déjà synthétisé (par exemple celui d'un export précédent)."""
+    path = cache_path(text, voice)
+    if not os.path.exists(path):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        shutil.copyfile(source, path)
+
+# Synthèses en cours, par chemin de cache : une réplique répétée (« Oui. ») n'est demandée qu'une fois
+_pending = {}
+
+async def get_clip(text, voice, pool=None):
+    """Chemin de l'extrait pour ce texte et cette voix, synthétisé s'il n'est pas en cache."""
+    path = cache_path(text, voice)
+    if os.path.exists(path):
+        return path
+
+    if path not in _pending:
+        _pending[path] = asyncio.ensure_future(_synthesize_clip(text, voice, path, pool))
+        _pending[path].add_done_callback(lambda _: _pending.pop(path, None))
+    # shield : un appelant annulé n'interrompt pas la synthèse attendue par les autres
+    return await asyncio.shield(_pending[path])
+
+async def _synthesize_clip(text, voice, path, pool):
+    if pool is None:
+        async with TTSPool(1) as own_pool:
+            audio = await own_pool.synthesize(text, voice)
+    else:
+        audio = await pool.synthesize(text, voice)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Écriture dans un fichier temporaire : un extrait interrompu ne pollue pas le cache
+    partial = f"{path}.{os.getpid()}.part"
+    with open(partial, "wb") as f:
+        f.write(audio)
+    os.replace(partial, path)
+    return path